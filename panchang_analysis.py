@@ -0,0 +1,165 @@
+"""
+Fetching and analysis behind the Streamlit dashboard, kept free of Streamlit
+so the same code can be driven headlessly (see panchang_loadtest.py). Pages
+are parsed, normalized and archived by the same panchang_scraper code the
+CLI uses.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from panchang_scraper import (
+    CircuitOpenError, DeadlineExceededError, FetchError, fetch_page, generate_url_for_date,
+    get_tharai_entry, normalize_day, refine_day_auspicious_windows, scrape_response
+)
+
+# Overall time budget for one "Get auspicious times" fetch, in seconds.
+FETCH_BUDGET_SECONDS = 20
+
+# ------------------ Utility Functions ------------------
+
+def format_dt(dt):
+    """Format a datetime object as 'Apr 24 04:18 AM'."""
+    return dt.strftime("%b %d %I:%M %p")
+
+# ------------------ Panchang Data Fetching Functions ------------------
+
+def fetch_data_from_url(url, deadline=None, date_key="", archive=None):
+    """
+    Fetch data from a server (URL not shown to user) and, if a PanchangArchive
+    is given, archive the raw page under date_key.
+    On failure returns {"missing": reason} so the day can be marked as unavailable.
+    """
+    try:
+        response = fetch_page(url, deadline)
+    except DeadlineExceededError:
+        return {"missing": "server did not respond in time"}
+    except CircuitOpenError:
+        return {"missing": "server temporarily unavailable"}
+    except FetchError:
+        return {"missing": "server error"}
+    return scrape_response(response, url, archive, date_key)
+
+def fetch_days(num_days=5, start_date=None, budget=FETCH_BUDGET_SECONDS, archive=None, on_day=None):
+    """
+    Fetch consecutive days within an overall time budget (seconds).
+    Days that fail or are not reached before the deadline are returned as
+    {"missing": reason} instead of blocking the caller. on_day(iso_date), if
+    given, is called before each day is fetched (the dashboard's progress label).
+    Returns (raw_data, normalized_data), both keyed by ISO date; missing days
+    appear only in raw_data.
+    """
+    if start_date is None:
+        start_date = datetime.today().date()
+
+    all_data = {}
+    normalized_data = {}
+    deadline = time.monotonic() + budget
+    for i in range(num_days):
+        current_date = start_date + timedelta(days=i)
+        url = generate_url_for_date(current_date)
+        if on_day is not None:
+            on_day(current_date.isoformat())
+        if time.monotonic() < deadline:
+            data = fetch_data_from_url(url, deadline, current_date.isoformat(), archive)
+        else:
+            data = {"missing": "time budget exhausted"}
+        all_data[current_date.isoformat()] = data
+        # Normalize once here; every analysis function reads only normalized_data,
+        # which holds just the days that were actually fetched.
+        if "missing" not in data:
+            normalized_data[current_date.isoformat()] = normalize_day(current_date.isoformat(), data)
+    return all_data, normalized_data
+
+def get_missing_days(fetched_data):
+    """Return {day: reason} for days that could not be fetched."""
+    return {day: data["missing"] for day, data in fetched_data.items() if "missing" in data}
+
+# ------------------- Additional Analysis Functions -------------------
+
+def get_time_periods(normalized_data):
+    """
+    Extract time period details from Panchang data for blocks with "Period" in the title.
+    """
+    periods = []
+    for day, normalized in normalized_data.items():
+        for pp in normalized["periods"]:
+            periods.append({
+                "date": day,
+                "period_type": pp.period_type,
+                "period": pp.name,
+                "time": pp.time
+            })
+    return periods
+
+def get_auspicious_dates_and_times(normalized_data, tharai_chart):
+    """
+    Gather auspicious nakshatras and auspicious periods by day.
+    """
+    # We'll use the lumps-based approach to get all intervals quickly
+    # (not reassigning to actual start date).
+    ausp_nak_by_day = defaultdict(list)
+    ausp_times_by_day = defaultdict(list)
+    for day, normalized in normalized_data.items():
+        for nk in normalized["nakshatras"]:
+            entry = get_tharai_entry(nk.name, tharai_chart)
+            if entry and entry["auspicious"]:
+                ausp_nak_by_day[day].append(f"{nk.name} ({nk.time})")
+        for pp in normalized["periods"]:
+            if pp.period_type == "Auspicious":
+                ausp_times_by_day[day].append(f"{pp.name}: {pp.time}")
+
+    # Build final list
+    result = []
+    all_dates = set(list(ausp_nak_by_day.keys()) + list(ausp_times_by_day.keys()))
+    for d in sorted(all_dates):
+        result.append({
+            "date": d,
+            "auspicious_nakshatras": ", ".join(ausp_nak_by_day[d]),
+            "auspicious_periods": ", ".join(ausp_times_by_day[d])
+        })
+    return result
+
+def get_nakshatra_auspicious_info_actual_date(normalized_data, tharai_chart):
+    """
+    Reassign each nakshatra interval to its actual start date, ignoring lumps.
+    """
+    results = []
+    for normalized in normalized_data.values():
+        for nk in normalized["nakshatras"]:
+            if not nk.start_dt:
+                continue
+            entry = get_tharai_entry(nk.name, tharai_chart)
+            results.append({
+                "date": nk.start_dt.date().isoformat(),
+                "nakshatra": nk.name,
+                "time": nk.time,
+                "tharai": entry["tharai"] if entry else "Unknown Tharai",
+                "auspicious": entry["auspicious"] if entry else False
+            })
+    return results
+
+def refine_auspicious_times(normalized_data, tharai_chart):
+    """
+    Intersect auspicious-Tharai nakshatra intervals with "Auspicious Period"
+    items day by day (refine_day_auspicious_windows) and return records
+    formatted for display.
+    """
+    results = []
+    for day in sorted(normalized_data):
+        for window in refine_day_auspicious_windows(day, normalized_data[day], tharai_chart):
+            nk_start, nk_end, pp_start, pp_end, start = (
+                datetime.fromisoformat(window[key])
+                for key in ("nakshatra_start", "nakshatra_end", "period_start", "period_end", "start")
+            )
+            results.append({
+                "date": day,
+                "nakshatra": window["nakshatra"],
+                "tharai_name": window["tharai_name"],
+                "tharai_meaning": window["tharai_meaning"],
+                "nakshatra_interval": f"{format_dt(nk_start)} – {format_dt(nk_end)}",
+                "panchang_period": window["panchang_period"],
+                "period_interval": f"{format_dt(pp_start)} – {format_dt(pp_end)}",
+                "start_dt": start
+            })
+    return results
@@ -0,0 +1,189 @@
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import threading
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ------------------ Compression Frames ------------------
+
+def default_codec():
+    """Prefer zstd when the zstandard package is installed, else gzip."""
+    return "zstd" if zstandard is not None else "gzip"
+
+def compress_frame(data, codec):
+    """Compress one page into a self-contained gzip member or zstd frame."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; cannot write zstd frames")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=9)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+def decompress_frame(frame, codec):
+    """Inverse of compress_frame."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; cannot read zstd frames")
+        return zstandard.ZstdDecompressor().decompress(frame)
+    if codec == "gzip":
+        return gzip.decompress(frame)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+# ------------------ Archive ------------------
+
+class PanchangArchive:
+    """
+    Append-only archive of raw fetched pages.
+
+    Every page is stored as its own compressed frame in `<path>` and described
+    by one JSON line in the sidecar index `<path>.idx`:
+        {"location", "date", "url", "fetched_at", "sha256", "codec", "offset", "length"}
+    Frames are addressed by offset, so a single page is read through mmap
+    without touching the rest of the file. Identical pages (by SHA-256) are
+    stored once; later fetches only add an index line pointing at the same frame.
+    One instance may be shared between threads; only one process may write.
+    """
+
+    def __init__(self, path, codec=None):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.codec = codec or default_codec()
+        self.entries = []
+        self._frames_by_hash = {}
+        self._mmap = None
+        self._mmap_size = 0
+        self._lock = threading.Lock()
+        self._load_index()
+        self._data_file = open(self.path, "ab")
+        self._index_file = open(self.index_path, "a", encoding="utf-8")
+
+    def _load_index(self):
+        """
+        Read the sidecar index. A torn last line left by a crash mid-write is
+        truncated away, and entries whose frame is not fully on disk are dropped.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        data_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with open(self.index_path, "rb") as f:
+            lines = f.read().split(b"\n")
+        good_bytes = 0
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                good_bytes += len(line) + 1
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if number != len(lines):
+                    raise ValueError(f"Corrupt archive index {self.index_path} at line {number}")
+                # Only the final, newline-less line can be torn by a crash.
+                with open(self.index_path, "r+b") as f:
+                    f.truncate(good_bytes)
+                break
+            good_bytes += len(line) + 1
+            if entry["offset"] + entry["length"] <= data_size:
+                self._add_entry(entry)
+
+    def _add_entry(self, entry):
+        self.entries.append(entry)
+        self._frames_by_hash.setdefault(entry["sha256"], entry)
+
+    def append(self, content, date, location="", url="", fetched_at=None):
+        """
+        Archive one fetched page (bytes or str). Returns its index entry.
+        Content already present in the archive is not written again.
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        with self._lock:
+            return self._append(content, date, location, url, fetched_at)
+
+    def _append(self, content, date, location, url, fetched_at):
+        digest = hashlib.sha256(content).hexdigest()
+        frame_entry = self._frames_by_hash.get(digest)
+        if frame_entry is None:
+            frame = compress_frame(content, self.codec)
+            self._data_file.seek(0, os.SEEK_END)
+            offset = self._data_file.tell()
+            self._data_file.write(frame)
+            # Data is flushed before its index line, so a crash can only leave
+            # unreferenced trailing bytes, never an index line without a frame.
+            self._data_file.flush()
+            codec, length = self.codec, len(frame)
+        else:
+            codec, offset, length = frame_entry["codec"], frame_entry["offset"], frame_entry["length"]
+        entry = {
+            "location": location,
+            "date": date,
+            "url": url,
+            "fetched_at": fetched_at or datetime.now().isoformat(timespec="seconds"),
+            "sha256": digest,
+            "codec": codec,
+            "offset": offset,
+            "length": length
+        }
+        self._index_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._index_file.flush()
+        self._add_entry(entry)
+        return entry
+
+    def read(self, entry):
+        """Return the raw page bytes for an index entry, read through mmap."""
+        end = entry["offset"] + entry["length"]
+        with self._lock:
+            if self._mmap is None or end > self._mmap_size:
+                self._remap()
+            frame = self._mmap[entry["offset"]:end]
+        return decompress_frame(frame, entry["codec"])
+
+    def _remap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        with open(self.path, "rb") as f:
+            self._mmap_size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._mmap_size else None
+        if self._mmap is None:
+            raise ValueError(f"Archive {self.path} is empty")
+
+    def latest_entries(self, location=None, start=None, end=None):
+        """
+        Return the most recently fetched entry per (location, date), sorted by date.
+        start/end are inclusive ISO date strings; location matches case-insensitively.
+        """
+        latest = {}
+        for entry in self.entries:
+            if location and entry["location"].lower() != location.lower():
+                continue
+            if (start and entry["date"] < start) or (end and entry["date"] > end):
+                continue
+            key = (entry["location"], entry["date"])
+            if key not in latest or entry["fetched_at"] >= latest[key]["fetched_at"]:
+                latest[key] = entry
+        return sorted(latest.values(), key=lambda e: (e["date"], e["location"]))
+
+    def iter_pages(self, location=None, start=None, end=None):
+        """Yield (entry, html_bytes) for the latest fetch of every matching day."""
+        for entry in self.latest_entries(location, start, end):
+            yield entry, self.read(entry)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,289 @@
+"""
+Load-test harness for the "Get auspicious times" flow.
+
+Serves recorded Panchang pages from a local stand-in HTTP server and drives N
+concurrent simulated dashboard sessions against it, reporting throughput,
+p50/p95/p99 latency and peak RSS for each concurrency level.
+
+    python panchang_loadtest.py --archive pages.bin --concurrency 1,2,4,8,16
+    python panchang_loadtest.py --pages pages/ --latency 0.2 --sessions 10
+
+The stand-in server runs in its own process, so its CPU and memory are not
+counted against the sessions. Each concurrency level runs in a fresh process,
+so its peak RSS is that level's alone. Within a level, sessions run as threads,
+like Streamlit sessions in one server, and call the dashboard's own fetch,
+parse and analysis functions from panchang_analysis, appending every page to
+one shared PanchangArchive (a temporary file) as the dashboard does. The real
+dashboard can also be
+pointed at the stand-in server with
+PANCHANG_BASE_URL=http://127.0.0.1:<port> streamlit run streamlit_dashboard_nakshatra_panchang.py
+"""
+import json
+import math
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import panchang_scraper
+from panchang_analysis import (
+    FETCH_BUDGET_SECONDS, fetch_days, get_auspicious_dates_and_times, get_missing_days,
+    get_nakshatra_auspicious_info_actual_date, get_time_periods, refine_auspicious_times
+)
+from panchang_archive import PanchangArchive
+from panchang_timeline import find_rule_windows
+
+DEFAULT_RULE = "tharai AND (auspicious_period OR gowri_good) AND NOT inauspicious_period"
+URL_DATE_PATTERN = re.compile(r'/astrology/tamil-panchangam/(\d{4}-[a-z]+-\d{1,2})\.html$')
+
+# ------------------ Stand-in Server ------------------
+
+def load_recorded_pages(archive_path=None, html_dir=None):
+    """Return {iso_date: html_bytes} from a PanchangArchive or a directory of YYYY-MM-DD.html files."""
+    pages = {}
+    if archive_path:
+        with PanchangArchive(archive_path) as archive:
+            for entry, html in archive.iter_pages():
+                pages[entry["date"]] = html
+    if html_dir:
+        pages.update(panchang_scraper.read_html_dir(html_dir))
+    return pages
+
+def make_handler(pages, latency):
+    """
+    Build a request handler serving recorded pages by date. Dates that were not
+    recorded are answered with a recorded page chosen deterministically, so any
+    date range can be load-tested.
+    """
+    ordered = [pages[d] for d in sorted(pages)]
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = URL_DATE_PATTERN.search(urlsplit(self.path).path)
+            if not match:
+                self.send_error(404)
+                return
+            day = datetime.strptime(match.group(1), "%Y-%B-%d").date()
+            body = pages.get(day.isoformat()) or ordered[day.toordinal() % len(ordered)]
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandInHandler
+
+def serve(pages, latency=0.0, port=0):
+    """
+    Run the stand-in server in the foreground. The first stdout line is JSON
+    {"base_url", "dates"} so the parent process knows where to connect.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(pages, latency))
+    server.daemon_threads = True
+    print(json.dumps({"base_url": f"http://127.0.0.1:{server.server_address[1]}",
+                      "dates": sorted(pages)}), flush=True)
+    server.serve_forever()
+
+def start_server_process(args):
+    """Start `panchang_loadtest.py --serve` as a subprocess; returns (process, base_url, dates)."""
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--latency", str(args.latency), "--port", str(args.port)]
+    if args.archive:
+        command += ["--archive", args.archive]
+    if args.pages:
+        command += ["--pages", args.pages]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError(f"Stand-in server exited with status {process.returncode}")
+    info = json.loads(line)
+    return process, info["base_url"], info["dates"]
+
+# ------------------ Simulated Sessions ------------------
+
+def run_session(start_date, num_days, tharai_chart, rule, budget, archive=None):
+    """
+    One "Get auspicious times" click: the dashboard's fetch under its time
+    budget, archiving each page, followed by every analysis the dashboard renders.
+    Returns the number of days that came back missing.
+    """
+    fetched, normalized = fetch_days(num_days, start_date, budget, archive)
+    refine_auspicious_times(normalized, tharai_chart)
+    get_nakshatra_auspicious_info_actual_date(normalized, tharai_chart)
+    get_time_periods(normalized)
+    get_auspicious_dates_and_times(normalized, tharai_chart)
+    if rule:
+        find_rule_windows(normalized, tharai_chart, rule)
+    return len(get_missing_days(fetched))
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_level(concurrency, sessions_per_worker, start_dates, num_days, tharai_chart, rule, budget,
+              archive=None):
+    """
+    Run `concurrency` workers, each performing sessions back to back; return a result row.
+    Sessions with missing days count as partial; sessions that raise count as
+    errors, and the first traceback of each level is printed to stderr.
+    """
+    latencies = []
+    partial = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(sessions_per_worker):
+            started = time.perf_counter()
+            missing = error = None
+            try:
+                missing = run_session(rng.choice(start_dates), num_days, tharai_chart, rule, budget, archive)
+            except Exception:
+                error = traceback.format_exc()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if error is not None:
+                    if not errors:
+                        print(error, file=sys.stderr)
+                    errors.append(error)
+                elif missing:
+                    partial.append(missing)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "sessions": len(latencies),
+        "partial_sessions": len(partial),
+        "error_sessions": len(errors),
+        "throughput_sessions_per_s": len(latencies) / wall if wall > 0 else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def run_level_process(config):
+    """
+    Body of a `--level` child process: run one level described by the JSON
+    config against the stand-in server, with a fresh temporary archive shared
+    by all sessions, and return its result row.
+    """
+    panchang_scraper.PANCHANG_BASE_URL = config["base_url"]
+    # Failures under load should show up as partial sessions, not trip the breaker.
+    panchang_scraper.PROKERALA_BREAKER.failure_threshold = float("inf")
+    tharai_chart = panchang_scraper.load_tharai_charts()[config["nakshatra"]]
+    start_dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in config["dates"]]
+    with tempfile.TemporaryDirectory() as tmp:
+        with PanchangArchive(os.path.join(tmp, "pages.bin")) as archive:
+            return run_level(config["concurrency"], config["sessions"], start_dates, config["days"],
+                             tharai_chart, config["rule"], config["budget"], archive)
+
+def run_level_subprocess(config):
+    """Run one level in a fresh `panchang_loadtest.py --level` process; returns its result row."""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--level"],
+                            input=json.dumps(config), stdout=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Level {config['concurrency']} exited with status {result.returncode}")
+    return json.loads(result.stdout)
+
+def print_header():
+    print(f"{'conc':>5} {'sessions':>8} {'partial':>7} {'errors':>6} {'sess/s':>8} "
+          f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'peak RSS MiB':>13}")
+
+def print_row(row):
+    print(f"{row['concurrency']:>5} {row['sessions']:>8} {row['partial_sessions']:>7} {row['error_sessions']:>6} "
+          f"{row['throughput_sessions_per_s']:>8.2f} {row['p50_s']:>7.3f} {row['p95_s']:>7.3f} "
+          f"{row['p99_s']:>7.3f} {row['peak_rss_mb']:>13.1f}", flush=True)
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--archive", help="PanchangArchive with recorded pages")
+    parser.add_argument("--pages", help="Directory of recorded pages named YYYY-MM-DD.html")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--sessions", type=int, default=5, help="Sessions per worker at each level")
+    parser.add_argument("--days", type=int, default=5, help="Days fetched per session")
+    parser.add_argument("--nakshatra", default=None, help="Tharai chart to analyse (default: first in tharais.json)")
+    parser.add_argument("--rule", default=DEFAULT_RULE, help="Custom rule evaluated in each session")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial server latency per page, seconds")
+    parser.add_argument("--budget", type=float, default=FETCH_BUDGET_SECONDS, help="Per-session fetch budget, seconds")
+    parser.add_argument("--port", type=int, default=0, help="Stand-in server port (default: any free port)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON instead of a table")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--level", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.level:
+        print(json.dumps(run_level_process(json.load(sys.stdin))))
+        return
+
+    if args.serve:
+        pages = load_recorded_pages(args.archive, args.pages)
+        if not pages:
+            parser.error("No recorded pages found; pass --archive and/or --pages")
+        serve(pages, args.latency, args.port)
+        return
+    if not (args.archive or args.pages):
+        parser.error("No recorded pages found; pass --archive and/or --pages")
+    charts = panchang_scraper.load_tharai_charts()
+    if args.nakshatra:
+        chart_name, tharai_chart = panchang_scraper.find_tharai_chart(charts, args.nakshatra)
+        if tharai_chart is None:
+            parser.error(f"Unknown nakshatra: {args.nakshatra}")
+    else:
+        chart_name = next(iter(charts))
+
+    server, base_url, dates = start_server_process(args)
+    rows = []
+    if not args.json:
+        print_header()
+    try:
+        for level in (int(c) for c in args.concurrency.split(",")):
+            rows.append(run_level_subprocess({
+                "base_url": base_url, "dates": dates, "concurrency": level,
+                "sessions": args.sessions, "days": args.days, "nakshatra": chart_name,
+                "rule": args.rule, "budget": args.budget
+            }))
+            if not args.json:
+                print_row(rows[-1])
+    finally:
+        server.terminate()
+        server.wait()
+    if args.json:
+        print(json.dumps(rows, indent=4))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
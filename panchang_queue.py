@@ -0,0 +1,250 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from datetime import timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    PRIMARY KEY (location, date)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    worker TEXT NOT NULL,
+    PRIMARY KEY (location, date)
+);
+CREATE TABLE IF NOT EXISTS rate_limit (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    next_slot REAL NOT NULL
+);
+INSERT OR IGNORE INTO rate_limit (id, next_slot) VALUES (1, 0);
+"""
+
+def default_worker_id():
+    """host:pid, unique across the machines sharing a queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue:
+    """
+    Shared SQLite queue of (location, date) backfill jobs.
+
+    Workers claim pending jobs, or jobs whose lease has expired because their
+    worker crashed, by taking a lease for `lease_seconds`. A failed job waits
+    `retry_delay` seconds, doubling per attempt, before it can be claimed
+    again. Results are upserted keyed by (location, date), so a job finished
+    twice after a lease takeover overwrites its row instead of duplicating it.
+    Times are wall-clock seconds, so machines sharing a queue need
+    synchronized clocks.
+
+    The rollback journal (journal_mode=DELETE) is used rather than WAL, which
+    needs shared memory and so only works for processes on one host. Sharing
+    the file between machines still needs a filesystem with working POSIX
+    locks; otherwise run all workers on the host that holds the file.
+    """
+
+    def __init__(self, path, worker_id=None, lease_seconds=120, max_attempts=5, retry_delay=30.0):
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Transactions are managed explicitly with BEGIN IMMEDIATE.
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front so claims never race."""
+        return _ImmediateTransaction(self.conn)
+
+    def add_jobs(self, location, start_date, end_date):
+        """Enqueue every date in [start_date, end_date]; existing jobs are left untouched."""
+        days = (end_date - start_date).days + 1
+        rows = [(location, (start_date + timedelta(days=i)).isoformat()) for i in range(days)]
+        with self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO jobs (location, date) VALUES (?, ?)", rows)
+            return self.conn.total_changes - before
+
+    def claim(self, batch_size=1):
+        """
+        Lease up to batch_size claimable jobs; returns [(location, date), ...].
+        Call renew() before working on each job, since the lease runs from the claim.
+        """
+        now = time.time()
+        with self._transaction():
+            # A job whose lease expired on its last attempt most likely crashed or
+            # hung its worker; fail it instead of handing it to the next one.
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_expires = NULL, "
+                "last_error = 'lease expired after ' || attempts || ' attempts' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            # Pending jobs can only be over the limit if max_attempts was lowered.
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed' WHERE status = 'pending' AND attempts >= ?",
+                (self.max_attempts,)
+            )
+            rows = self.conn.execute(
+                "SELECT location, date FROM jobs "
+                "WHERE ((status = 'pending' AND not_before <= ?) OR (status = 'leased' AND lease_expires < ?)) "
+                "AND attempts < ? "
+                "ORDER BY date, location LIMIT ?",
+                (now, now, self.max_attempts, batch_size)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE location = ? AND date = ?",
+                [(self.worker_id, now + self.lease_seconds, location, date) for location, date in rows]
+            )
+        return rows
+
+    def renew(self, location, date):
+        """
+        Extend this worker's lease on a job by lease_seconds. Returns False if
+        the lease was lost to another worker after it expired.
+        """
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE location = ? AND date = ? AND worker = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, location, date, self.worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, location, date):
+        """Hand a leased job back untried; the claim does not count as an attempt."""
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE jobs SET status = 'pending', lease_expires = NULL, attempts = attempts - 1 "
+                "WHERE location = ? AND date = ? AND worker = ? AND status = 'leased'",
+                (location, date, self.worker_id)
+            )
+
+    def complete(self, location, date, data):
+        """Store the result and mark the job done, in one transaction."""
+        with self._transaction():
+            self.conn.execute(
+                "INSERT INTO results (location, date, data, fetched_at, worker) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (location, date) DO UPDATE SET "
+                "data = excluded.data, fetched_at = excluded.fetched_at, worker = excluded.worker",
+                (location, date, json.dumps(data, ensure_ascii=False), time.time(), self.worker_id)
+            )
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', lease_expires = NULL, last_error = NULL "
+                "WHERE location = ? AND date = ?",
+                (location, date)
+            )
+
+    def fail(self, location, date, error):
+        """
+        Release a failed job for retry after retry_delay * 2 ** (attempts - 1)
+        seconds, or mark it failed after max_attempts.
+        """
+        with self._transaction():
+            row = self.conn.execute(
+                "SELECT attempts FROM jobs WHERE location = ? AND date = ? AND worker = ? AND status = 'leased'",
+                (location, date, self.worker_id)
+            ).fetchone()
+            if row is None:
+                return
+            attempts = row[0]
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, lease_expires = NULL, not_before = ?, last_error = ? "
+                "WHERE location = ? AND date = ?",
+                ("failed" if attempts >= self.max_attempts else "pending",
+                 time.time() + self.retry_delay * 2 ** max(0, attempts - 1), str(error), location, date)
+            )
+
+    def wait_for_rate_slot(self, rate):
+        """
+        Block until this worker may make its next request under a global limit
+        of `rate` requests per second shared by every worker on the queue.
+        """
+        if not rate:
+            return
+        with self._transaction():
+            next_slot = self.conn.execute("SELECT next_slot FROM rate_limit WHERE id = 1").fetchone()[0]
+            slot = max(time.time(), next_slot)
+            self.conn.execute("UPDATE rate_limit SET next_slot = ? WHERE id = 1", (slot + 1.0 / rate,))
+        delay = slot - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def has_unfinished(self):
+        """True while any job is pending or leased (possibly to a worker that may crash)."""
+        row = self.conn.execute(
+            "SELECT 1 FROM jobs WHERE status IN ('pending', 'leased') LIMIT 1"
+        ).fetchone()
+        return row is not None
+
+    def seconds_until_claimable(self):
+        """
+        Seconds until a job may next be claimed: the earliest lease expiry or
+        retry time. None if nothing is pending or leased.
+        """
+        row = self.conn.execute(
+            "SELECT MIN(CASE status WHEN 'leased' THEN lease_expires ELSE not_before END) "
+            "FROM jobs WHERE status IN ('pending', 'leased')"
+        ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def status(self, window_seconds=60):
+        """Job counts by status plus aggregate results/s over the last window_seconds."""
+        counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        recent = self.conn.execute(
+            "SELECT COUNT(*) FROM results WHERE fetched_at >= ?", (time.time() - window_seconds,)
+        ).fetchone()[0]
+        workers = self.conn.execute(
+            "SELECT COUNT(DISTINCT worker) FROM jobs WHERE status = 'leased' AND lease_expires >= ?",
+            (time.time(),)
+        ).fetchone()[0]
+        return {
+            "counts": counts,
+            "active_workers": workers,
+            "results_per_s": recent / window_seconds
+        }
+
+    def iter_results(self, location=None):
+        """Yield (location, date, data) for stored results, ordered by location, then date."""
+        query = "SELECT location, date, data FROM results"
+        params = ()
+        if location:
+            query += " WHERE location = ?"
+            params = (location,)
+        for loc, date, data in self.conn.execute(query + " ORDER BY location, date", params):
+            yield loc, date, json.loads(data)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class _ImmediateTransaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
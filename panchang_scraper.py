@@ -1,8 +1,22 @@
+import csv
+import hashlib
 import json
+import os
+import random
+import re
 import sys
+import threading
+import time
 import requests
-from datetime import datetime, timedelta
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from datetime import datetime, timedelta, timezone
 from bs4 import BeautifulSoup
+from urllib.parse import quote
+from zoneinfo import ZoneInfo
+from panchang_archive import PanchangArchive
+from panchang_queue import WorkQueue
 
 def safe_text(element):
     """Return the stripped text of an element, or an empty string if the element is None."""
@@ -136,40 +150,869 @@ def scrape_panchang(html_content):
     }
     return data
 
-def scrape_panchang_from_url(url):
-    """Fetch the page content from the URL and scrape Panchang details."""
+# ------------------ Deadline-bounded Fetching ------------------
+
+# (connect, read) timeouts in seconds for a single request.
+DEFAULT_TIMEOUT = (3.05, 10)
+
+class FetchError(Exception):
+    """Raised when a page could not be fetched within its attempts or deadline."""
+
+class DeadlineExceededError(FetchError):
+    """Raised when the deadline leaves no time for another attempt."""
+
+class CircuitOpenError(FetchError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed fetches and rejects
+    requests for `reset_after` seconds. It then goes half-open: exactly one
+    probe request is let through, and its result closes or re-opens the circuit.
+    Shared between threads (e.g. concurrent dashboard sessions).
+    """
+
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_after:
+                return False
+            # Half-open: this caller is the single probe.
+            self.probing = True
+            return True
+
+    def seconds_until_probe(self):
+        """Seconds until a probe may be let through; 0 when the circuit is closed."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_after - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """End a probe that never reached the server, leaving the circuit as it was."""
+        with self._lock:
+            self.probing = False
+
+PROKERALA_BREAKER = CircuitBreaker()
+
+def is_retryable(error):
+    """Timeouts, connection errors, 429 and 5xx responses are worth retrying."""
+    if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+def fetch_page(url, deadline=None, timeout=DEFAULT_TIMEOUT, max_attempts=4, backoff=0.5,
+               breaker=PROKERALA_BREAKER):
+    """
+    GET url with per-request (connect, read) timeouts and jittered exponential
+    backoff between attempts. deadline is an absolute time.monotonic() value;
+    no attempt or backoff sleep runs past it. Returns the response or raises FetchError.
+    The breaker sees one success or failure per call, not one per attempt.
+    """
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(f"Circuit open, skipping {url}")
+    try:
+        response = fetch_with_retries(url, deadline, timeout, max_attempts, backoff)
+    except FetchError as e:
+        if breaker is not None:
+            if e.__cause__ is None:
+                # Deadline hit before any request was made.
+                breaker.release()
+            elif is_retryable(e.__cause__):
+                breaker.record_failure()
+            else:
+                # The server answered (e.g. 404), so it is not down.
+                breaker.record_success()
+        raise
+    except BaseException:
+        if breaker is not None:
+            breaker.release()
+        raise
+    if breaker is not None:
+        breaker.record_success()
+    return response
+
+# Largest piece of the body read between deadline checks.
+BODY_CHUNK_SIZE = 16384
+
+def read_body(response, deadline=None):
+    """
+    Read a response opened with stream=True into response.content, checking
+    deadline after every piece. The (connect, read) timeout only bounds each
+    socket read, so a server trickling bytes could otherwise hold the request
+    open far past the deadline. Raises requests.ReadTimeout once it passes.
+    """
+    raw = response.raw
+    # read1 returns whatever one socket read produced; urllib3 < 2 lacks it, so
+    # fall back to small fixed-size pieces.
+    if hasattr(raw, "read1"):
+        pieces = iter(lambda: raw.read1(BODY_CHUNK_SIZE, decode_content=True), b"")
+    else:
+        pieces = response.iter_content(1024)
+    body = []
+    for piece in pieces:
+        body.append(piece)
+        if deadline is not None and time.monotonic() >= deadline:
+            raise requests.ReadTimeout(f"Body of {response.url} not received before the deadline")
+    # Cache the body the way requests does, so .content and .text work as usual.
+    response._content = b"".join(body)
+    response._content_consumed = True
+    return response
+
+def fetch_with_retries(url, deadline=None, timeout=DEFAULT_TIMEOUT, max_attempts=4, backoff=0.5):
+    """The retry loop behind fetch_page, without the circuit breaker."""
+    last_error = None
+    for attempt in range(max_attempts):
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededError(f"Deadline exceeded fetching {url}: {last_error}") from last_error
+        attempt_timeout = timeout
+        if remaining is not None:
+            attempt_timeout = (min(timeout[0], remaining), min(timeout[1], remaining))
+        try:
+            response = requests.get(url, timeout=attempt_timeout, stream=True)
+            try:
+                response.raise_for_status()
+                read_body(response, deadline)
+            finally:
+                # Releases the connection; the body, if read, is kept.
+                response.close()
+        except requests.RequestException as e:
+            last_error = e
+            if not is_retryable(e):
+                raise FetchError(f"Error fetching URL {url}: {e}") from e
+        else:
+            return response
+        if attempt == max_attempts - 1:
+            break
+        # Full jitter: sleep a random fraction of the exponential backoff.
+        delay = random.uniform(0, backoff * (2 ** attempt))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise DeadlineExceededError(f"Deadline exceeded fetching {url}: {last_error}") from last_error
+        time.sleep(delay)
+    raise FetchError(f"Error fetching URL {url}: {last_error}") from last_error
+
+def scrape_panchang_from_url(url, archive=None, date_key="", deadline=None):
+    """
+    Fetch the page content from the URL and scrape Panchang details.
+    If a PanchangArchive is given, the raw page is appended to it under date_key.
+    Returns {} when the page cannot be fetched before the deadline.
+    Used by the sequential CLI paths, which fetch one page at a time, so the
+    shared circuit breaker is bypassed: every day gets its full retries and a
+    day that still fails is reported missing rather than skipped by an open circuit.
+    """
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except Exception as e:
-        print(f"Error fetching URL {url}: {e}")
+        response = fetch_page(url, deadline, breaker=None)
+    except FetchError as e:
+        print(e, file=sys.stderr)
         return {}
-    html_content = response.text
-    return scrape_panchang(html_content)
+    return scrape_response(response, url, archive, date_key)
+
+def scrape_response(response, url, archive=None, date_key=""):
+    """
+    Scrape a fetched page and, if a PanchangArchive is given, append the raw
+    page to it under date_key and the page's location.
+    """
+    data = scrape_panchang(response.text)
+    if archive is not None:
+        location = data.get('primary_header', {}).get('location', '')
+        archive.append(response.content, date_key, location=location, url=url)
+    return data
+
+# Overridable so a local stand-in server can replace prokerala (see panchang_loadtest.py).
+PANCHANG_BASE_URL = os.environ.get("PANCHANG_BASE_URL", "https://www.prokerala.com")
 
-def generate_url_for_date(date_obj):
-    """Generates a Panchang URL for a given date object."""
+def generate_url_for_date(date_obj, location=""):
+    """
+    Generates a Panchang URL for a given date object.
+    location is a prokerala location id; empty means the site's default location.
+    """
     # Format date as YYYY-month-day with month in lower-case.
     date_str = date_obj.strftime("%Y-%B-%d").lower()
-    return f"https://www.prokerala.com/astrology/tamil-panchangam/{date_str}.html"
+    url = f"{PANCHANG_BASE_URL}/astrology/tamil-panchangam/{date_str}.html"
+    if location:
+        url += f"?loc={quote(location)}"
+    return url
 
-def scrape_multiple_days(num_days=5):
-    """Scrapes Panchang details for the given number of consecutive days starting from the current date."""
+def scrape_multiple_days(num_days=5, archive=None):
+    """
+    Scrapes Panchang details for the given number of consecutive days starting from the current date.
+    Days that could not be fetched are returned as {}.
+    """
     start_date = datetime.today().date()
     all_data = {}
     for i in range(num_days):
         current_date = start_date + timedelta(days=i)
         url = generate_url_for_date(current_date)
-        print(f"Scraping {url} ...")
-        data = scrape_panchang_from_url(url)
+        print(f"Scraping {url} ...", file=sys.stderr)
+        data = scrape_panchang_from_url(url, archive, current_date.isoformat())
         all_data[current_date.isoformat()] = data
     return all_data
 
+# ------------------ Parallel Re-parsing ------------------
+
+def parse_page_bytes(html_bytes):
+    """
+    Process-pool worker: parse one raw page and return plain dicts.
+    Only bytes go in and only builtins come out, so no soup is ever pickled.
+    """
+    return scrape_panchang(html_bytes)
+
+def parse_pages_parallel(pages, workers=None, chunksize=None, executor=None):
+    """
+    Parse a list of raw HTML pages (bytes) across a process pool.
+    Pages are shipped to workers in chunks and results are yielded in input order.
+    Pass an existing ProcessPoolExecutor to reuse its workers across calls.
+    The whole list is held in memory; use parse_in_batches for long runs.
+    """
+    workers = workers or os.cpu_count() or 1
+    if executor is None and (workers == 1 or len(pages) <= 1):
+        for html_bytes in pages:
+            yield parse_page_bytes(html_bytes)
+        return
+    if chunksize is None:
+        # A few chunks per worker keeps IPC overhead low while balancing load.
+        chunksize = max(1, len(pages) // (workers * 4))
+    if executor is not None:
+        yield from executor.map(parse_page_bytes, pages, chunksize=chunksize)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(parse_page_bytes, pages, chunksize=chunksize)
+
+def parse_in_batches(items, read_page, workers=None, batch_size=256, chunksize=None):
+    """
+    Yield (item, data) for each item of a (possibly lazy) iterable, where
+    read_page(item) returns the raw page bytes. Pages are read and parsed a
+    batch at a time, every batch going through the same process pool, so
+    memory is bounded by batch_size rather than by the number of items.
+    """
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    items = iter(items)
+    try:
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+            pages = [read_page(item) for item in batch]
+            yield from zip(batch, parse_pages_parallel(pages, workers, chunksize, executor))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def iter_html_files(html_dir):
+    """Yield (date_key, path) for every *.html file in html_dir, sorted by name, without reading them."""
+    for name in sorted(os.listdir(html_dir)):
+        if name.endswith(".html"):
+            yield name[:-len(".html")], os.path.join(html_dir, name)
+
+def read_file_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def read_html_dir(html_dir):
+    """Return [(date_key, html_bytes), ...] for every *.html file in html_dir, all read into memory."""
+    return [(key, read_file_bytes(path)) for key, path in iter_html_files(html_dir)]
+
+def write_json_stream(pairs, out):
+    """
+    Write (key, value) pairs to out as one JSON object, a pair at a time.
+    The output is identical to json.dumps(dict(pairs), indent=4) without
+    ever holding the whole object. Returns the number of pairs written.
+    """
+    count = 0
+    for key, value in pairs:
+        out.write("{\n" if count == 0 else ",\n")
+        body = json.dumps(value, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+        out.write(f"    {json.dumps(key, ensure_ascii=False)}: {body}")
+        count += 1
+    out.write("\n}\n" if count else "{}\n")
+    return count
+
+def run_reparse(argv):
+    """Command-line entry point for: panchang_scraper.py reparse HTML_DIR [options]."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="panchang_scraper.py reparse",
+        description="Re-parse archived Panchang pages in parallel and print the results as JSON."
+    )
+    parser.add_argument("html_dir", help="Directory of saved pages named YYYY-MM-DD.html")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=None, help="Pages per task sent to a worker")
+    parser.add_argument("--batch", type=int, default=256, help="Pages read into memory at a time")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    parsed = parse_in_batches(iter_html_files(args.html_dir), lambda item: read_file_bytes(item[1]),
+                              args.workers, args.batch, args.chunksize)
+    count = write_json_stream(((key, data) for (key, _), data in parsed), sys.stdout)
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Parsed {count} pages in {elapsed:.1f}s ({rate:.1f} pages/s)", file=sys.stderr)
+
+# ------------------ Archive Replay ------------------
+
+def replay_archive(archive, location=None, start=None, end=None, workers=1, batch_size=256):
+    """
+    Re-run scrape_panchang over archived pages with no network access.
+    Yields (entry, data) for the latest fetch of each matching (location, date);
+    pages are decompressed and parsed a batch at a time to bound memory.
+    """
+    entries = archive.latest_entries(location, start, end)
+    yield from parse_in_batches(entries, archive.read, workers, batch_size)
+
+def run_replay(argv):
+    """Command-line entry point for: panchang_scraper.py replay ARCHIVE [options]."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="panchang_scraper.py replay",
+        description="Re-parse pages from a raw-page archive and print the results as JSON."
+    )
+    parser.add_argument("archive", help="Archive file written with --archive")
+    parser.add_argument("--location", help="Only replay pages for this location")
+    parser.add_argument("--start", help="First date, YYYY-MM-DD")
+    parser.add_argument("--end", help="Last date inclusive, YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for parsing")
+    args = parser.parse_args(argv)
+
+    with PanchangArchive(args.archive) as archive:
+        locations = {e["location"] for e in archive.latest_entries(args.location, args.start, args.end)}
+        if len(locations) > 1:
+            parser.error(f"Archive holds several locations, pick one with --location: {sorted(locations)}")
+        started = time.perf_counter()
+        replayed = replay_archive(archive, args.location, args.start, args.end, args.workers)
+        count = write_json_stream(((entry["date"], data) for entry, data in replayed), sys.stdout)
+        elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Replayed {count} pages in {elapsed:.1f}s ({rate:.1f} pages/s)", file=sys.stderr)
+
+# ------------------ Distributed Backfill ------------------
+
+def run_queue_worker(queue, rate=None, batch_size=1, idle_poll=1.0, breaker=PROKERALA_BREAKER, archive=None):
+    """
+    Claim and process (location, date) jobs until none are pending or leased.
+    Jobs leased by a crashed worker become claimable again once their lease
+    expires, so idle workers keep polling while other leases are outstanding.
+    Each job gets a single request per claim, so every request, including a
+    retry, takes a slot under the global rate; retries are scheduled by the queue.
+    While the circuit breaker is open the worker waits instead of burning attempts.
+    If a PanchangArchive is given, every fetched page is appended to it.
+    Returns (jobs_done, failed_attempts, elapsed_seconds).
+    """
+    done = failed = 0
+    started = time.perf_counter()
+    while True:
+        if breaker is not None:
+            time.sleep(breaker.seconds_until_probe())
+        jobs = queue.claim(batch_size)
+        if not jobs:
+            if not queue.has_unfinished():
+                break
+            until_claimable = queue.seconds_until_claimable()
+            time.sleep(idle_poll if until_claimable is None else min(idle_poll, until_claimable))
+            continue
+        for i, (location, date) in enumerate(jobs):
+            queue.wait_for_rate_slot(rate)
+            if not queue.renew(location, date):
+                # The lease expired while earlier jobs ran and another worker took it.
+                continue
+            url = generate_url_for_date(datetime.strptime(date, "%Y-%m-%d").date(), location)
+            try:
+                response = fetch_page(url, max_attempts=1, breaker=breaker)
+            except CircuitOpenError:
+                for job in jobs[i:]:
+                    queue.release(*job)
+                break
+            except FetchError as e:
+                print(e, file=sys.stderr)
+                queue.fail(location, date, e)
+                failed += 1
+                continue
+            queue.complete(location, date, scrape_response(response, url, archive, date))
+            done += 1
+    return done, failed, time.perf_counter() - started
+
+def worker_archive_path(directory, worker_id):
+    """
+    Per-worker archive file in directory. PanchangArchive allows a single
+    writer process, so workers never share one.
+    """
+    return os.path.join(directory, re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id) + ".bin")
+
+def run_queue_command(command, argv):
+    """Command-line entry point for the queue-add, worker, queue-status and queue-export subcommands."""
+    import argparse
+    parse_date = lambda s: datetime.strptime(s, "%Y-%m-%d").date()
+    parser = argparse.ArgumentParser(prog=f"panchang_scraper.py {command}")
+    parser.add_argument("queue", help="SQLite queue file shared by all workers")
+    if command == "queue-add":
+        parser.description = "Enqueue (location, date) backfill jobs."
+        parser.add_argument("--location", action="append", default=None,
+                            help="prokerala location id; repeat for several (default: site default)")
+        parser.add_argument("--start", type=parse_date, required=True, help="First date, YYYY-MM-DD")
+        parser.add_argument("--end", type=parse_date, required=True, help="Last date inclusive, YYYY-MM-DD")
+    elif command == "worker":
+        parser.description = "Claim and scrape queued jobs until the queue is drained."
+        parser.add_argument("--rate", type=float, default=1.0,
+                            help="Global requests per second shared by all workers (0 = unlimited)")
+        parser.add_argument("--lease", type=float, default=120.0, help="Lease duration in seconds")
+        parser.add_argument("--batch", type=int, default=1, help="Jobs claimed at once; each lease is renewed when its job starts")
+        parser.add_argument("--max-attempts", type=int, default=5, help="Attempts before a job is marked failed")
+        parser.add_argument("--retry-delay", type=float, default=30.0,
+                            help="Seconds before a failed job is retried, doubled per attempt")
+        parser.add_argument("--worker-id", default=None, help="Worker name (default: host:pid)")
+        parser.add_argument("--archive", default=None,
+                            help="Directory for raw-page archives; each worker writes its own <worker-id>.bin")
+    elif command == "queue-export":
+        parser.description = "Print stored results as JSON keyed by date (or location, then date)."
+        parser.add_argument("--location", default=None, help="Only export this location")
+    args = parser.parse_args(argv)
+
+    if command == "worker":
+        queue = WorkQueue(args.queue, args.worker_id, args.lease, args.max_attempts, args.retry_delay)
+    else:
+        queue = WorkQueue(args.queue)
+    with queue:
+        if command == "queue-add":
+            added = 0
+            for location in args.location or [""]:
+                added += queue.add_jobs(location, args.start, args.end)
+            print(f"Enqueued {added} new jobs", file=sys.stderr)
+        elif command == "worker":
+            archive = None
+            if args.archive:
+                os.makedirs(args.archive, exist_ok=True)
+                archive = PanchangArchive(worker_archive_path(args.archive, queue.worker_id))
+            try:
+                done, failed, elapsed = run_queue_worker(queue, args.rate, args.batch, archive=archive)
+            finally:
+                if archive is not None:
+                    archive.close()
+            rate = done / elapsed if elapsed > 0 else 0.0
+            print(f"Worker {queue.worker_id}: {done} done, {failed} failed attempts in {elapsed:.1f}s "
+                  f"({rate:.2f} jobs/s)", file=sys.stderr)
+        elif command == "queue-status":
+            print(json.dumps(queue.status(), indent=4))
+        elif command == "queue-export":
+            results = {}
+            for location, date, data in queue.iter_results(args.location):
+                results.setdefault(location, {})[date] = data
+            if len(results) == 1:
+                results = next(iter(results.values()))
+            print(json.dumps(results, indent=4, ensure_ascii=False))
+
+# ------------------ Tharai Analysis ------------------
+
+THARAIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tharais.json")
+
+def load_tharai_charts(json_path=THARAIS_PATH):
+    """Load the Tharai charts keyed by birth nakshatra."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def find_tharai_chart(tharai_charts, nakshatra):
+    """Return (chart_name, chart) for a case-insensitive nakshatra name, or (None, None)."""
+    for name, chart in tharai_charts.items():
+        if name.lower() == nakshatra.strip().lower():
+            return name, chart
+    return None, None
+
+def get_tharai_entry(star_name, tharai_chart):
+    """Return the Tharai chart entry containing star_name, or None."""
+    star_lower = star_name.strip().lower()
+    for entry in tharai_chart:
+        if any(star_lower == s.lower() for s in entry["nakshatra_names"]):
+            return entry
+    return None
+
+def nearest_year(dt, day_date):
+    """
+    Move a year-less parsed datetime to the year closest to day_date.
+    Intervals listed on Dec 31 / Jan 1 pages cross the year boundary.
+    """
+    if (dt.date() - day_date).days > 183:
+        return dt.replace(year=dt.year - 1)
+    if (day_date - dt.date()).days > 183:
+        return dt.replace(year=dt.year + 1)
+    return dt
+
+def parse_datetime_str(date_str, day_date):
+    """Parse a string like 'Mar 23 03:23 AM', inferring the year from day_date when missing."""
+    pattern_year = r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}\s+\d{4}'
+    if re.search(pattern_year, date_str):
+        return datetime.strptime(date_str, "%b %d %Y %I:%M %p")
+    parts = date_str.split()
+    if len(parts) >= 2:
+        date_str = f"{parts[0]} {parts[1]} {day_date.year} {' '.join(parts[2:])}"
+    return nearest_year(datetime.strptime(date_str, "%b %d %Y %I:%M %p"), day_date)
+
+TIME_ONLY_PATTERN = re.compile(r'^\d{1,2}:\d{2}\s*[AP]M$')
+
+def parse_time_point(text, day_date):
+    """Parse '11:51 AM' (on day_date) or 'Mar 26 03:49 AM'. Raises ValueError."""
+    if TIME_ONLY_PATTERN.match(text):
+        return datetime.combine(day_date, datetime.strptime(text, "%I:%M %p").time())
+    return parse_datetime_str(text, day_date)
+
+def parse_time_range(time_str, day_date):
+    """
+    Parse '11:51 AM – 12:40 PM', 'Mar 26 03:49 AM – Mar 27 02:29 AM' or a mix
+    such as '11:30 PM – Mar 25 01:10 AM'; each side is parsed on its own.
+    A time-only end at or before the start runs past midnight.
+    Returns (start_dt, end_dt) or None if the string cannot be parsed.
+    """
+    if "–" not in time_str:
+        return None
+    start_str, end_str = (part.strip() for part in time_str.split("–", 1))
+    try:
+        start_dt = parse_time_point(start_str, day_date)
+        end_dt = parse_time_point(end_str, day_date)
+    except ValueError:
+        return None
+    if end_dt <= start_dt and TIME_ONLY_PATTERN.match(end_str):
+        end_dt += timedelta(days=1)
+    return start_dt, end_dt
+
+# ------------------ Normalized Day Model ------------------
+
+# start_dt/end_dt are None when the time string could not be parsed.
+NakshatraInterval = namedtuple("NakshatraInterval", ["name", "time", "start_dt", "end_dt"])
+PanchangPeriod = namedtuple("PanchangPeriod", ["name", "time", "period_type", "start_dt", "end_dt"])
+GowriSlot = namedtuple("GowriSlot", ["tab", "period", "time", "status", "start_dt", "end_dt"])
+
+def classify_period(title):
+    """Return 'Auspicious', 'Inauspicious' or 'Unknown' for a "Period" block title."""
+    title_lower = title.lower()
+    if "inauspicious period" in title_lower:
+        return "Inauspicious"
+    if "auspicious period" in title_lower:
+        return "Auspicious"
+    return "Unknown"
+
+def normalize_day(day, day_data):
+    """
+    Walk one fetched day's raw sections once and return
+    {"nakshatras": [NakshatraInterval], "periods": [PanchangPeriod], "gowri": [GowriSlot]}
+    with every time string parsed into datetimes.
+    """
+    day_date = datetime.strptime(day, "%Y-%m-%d").date()
+    nakshatras = []
+    periods = []
+    for title, items in day_data.get("details", {}).items():
+        is_nakshatra = "nakshatram" in title.lower()
+        is_period = "period" in title.lower()
+        if not (is_nakshatra or is_period):
+            continue
+        for item in items:
+            if "name" not in item or "time" not in item:
+                continue
+            start_dt, end_dt = parse_time_range(item["time"], day_date) or (None, None)
+            if is_nakshatra:
+                nakshatras.append(NakshatraInterval(item["name"].strip(), item["time"], start_dt, end_dt))
+            else:
+                periods.append(PanchangPeriod(
+                    item["name"], item["time"], classify_period(title), start_dt, end_dt
+                ))
+    gowri = []
+    for tab_id, entries in day_data.get("gowri_panchang", {}).items():
+        is_night = "night" in tab_id.lower()
+        for entry in entries:
+            start_dt, end_dt = parse_time_range(entry.get("time", ""), day_date) or (None, None)
+            # Night slots run from sunset to the next sunrise, so one that starts
+            # before sunset belongs to the following morning. Noon is used as the
+            # cut-off so a slot starting a minute off the published sunset is safe.
+            if is_night and start_dt and start_dt.hour < 12:
+                start_dt += timedelta(days=1)
+                end_dt += timedelta(days=1)
+            gowri.append(GowriSlot(
+                tab_id, entry.get("period", ""), entry.get("time", ""), entry.get("status"), start_dt, end_dt
+            ))
+    return {"nakshatras": nakshatras, "periods": periods, "gowri": gowri}
+
+def normalize_days(fetched_data):
+    """
+    Normalize every fetched day once. The result is kept next to the raw data,
+    as {day: normalized}, so the raw dicts stay JSON-serializable.
+    """
+    return {day: normalize_day(day, day_data) for day, day_data in fetched_data.items()}
+
+def refine_day_auspicious_windows(day, normalized, tharai_chart):
+    """
+    Yield the intersections of auspicious-Tharai nakshatra intervals with the
+    "Auspicious Period" items of a single normalized day, in start order.
+    """
+    nakshatras = []
+    for nk in normalized["nakshatras"]:
+        entry = get_tharai_entry(nk.name, tharai_chart)
+        if entry and entry["auspicious"] and nk.start_dt:
+            nakshatras.append((nk, entry))
+    periods = [pp for pp in normalized["periods"] if pp.period_type == "Auspicious" and pp.start_dt]
+
+    windows = []
+    for nk, entry in nakshatras:
+        for pp in periods:
+            start = max(nk.start_dt, pp.start_dt)
+            end = min(nk.end_dt, pp.end_dt)
+            if end > start:
+                windows.append({
+                    "date": day,
+                    "nakshatra": nk.name,
+                    "tharai_name": entry["tharai"],
+                    "tharai_meaning": entry.get("meaning", ""),
+                    "nakshatra_start": nk.start_dt.isoformat(),
+                    "nakshatra_end": nk.end_dt.isoformat(),
+                    "panchang_period": pp.name,
+                    "period_start": pp.start_dt.isoformat(),
+                    "period_end": pp.end_dt.isoformat(),
+                    "start": start.isoformat(),
+                    "end": end.isoformat()
+                })
+    windows.sort(key=lambda w: w["start"])
+    yield from windows
+
+# ------------------ Streaming Export ------------------
+
+EXPORT_FIELDS = [
+    "date", "nakshatra", "tharai_name", "tharai_meaning",
+    "nakshatra_start", "nakshatra_end", "panchang_period",
+    "period_start", "period_end", "start", "end"
+]
+
+# Page times are local to the panchang location; prokerala's default is in India.
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+
+def iter_days(start_date, end_date):
+    """Yield each date from start_date to end_date inclusive."""
+    current = start_date
+    while current <= end_date:
+        yield current
+        current += timedelta(days=1)
+
+def iter_auspicious_windows(tharai_chart, start_date, end_date, stats=None, archive=None):
+    """
+    Fetch one day at a time and yield its refined auspicious windows.
+    Nothing is retained between days, so memory stays flat for any range.
+    If stats is a dict, the 'days' and 'windows' counters and the 'missing'
+    list of dates that could not be fetched are updated in place.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("days", 0)
+    stats.setdefault("windows", 0)
+    stats.setdefault("missing", [])
+    for current_date in iter_days(start_date, end_date):
+        url = generate_url_for_date(current_date)
+        day_data = scrape_panchang_from_url(url, archive, current_date.isoformat())
+        if not day_data:
+            stats["missing"].append(current_date.isoformat())
+            continue
+        stats["days"] += 1
+        normalized = normalize_day(current_date.isoformat(), day_data)
+        for window in refine_day_auspicious_windows(current_date.isoformat(), normalized, tharai_chart):
+            stats["windows"] += 1
+            yield window
+
+def ics_escape(text):
+    """Escape a TEXT value for iCalendar (RFC 5545 section 3.3.11)."""
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+                .replace(",", "\\,").replace("\n", "\\n"))
+
+def ics_fold(line):
+    """Fold a content line to 75 octets, continuing with a leading space."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    chunks = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split inside a multi-byte UTF-8 sequence.
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(chunks) + "\r\n"
+
+def ics_datetime(iso_str, tz):
+    """Convert a naive ISO datetime in the IANA zone tz into a UTC iCalendar DATE-TIME."""
+    local = datetime.fromisoformat(iso_str).replace(tzinfo=ZoneInfo(tz))
+    return local.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def ics_event(window, nakshatra, dtstamp, tz=DEFAULT_TIMEZONE):
+    """Return the VEVENT lines for one auspicious window."""
+    uid_source = f"{nakshatra}|{window['nakshatra']}|{window['panchang_period']}|{window['start']}"
+    uid = hashlib.sha1(uid_source.encode("utf-8")).hexdigest()
+    summary = f"{window['panchang_period']} – {window['nakshatra']} ({window['tharai_name']})"
+    description = (
+        f"Tharai: {window['tharai_name']} — {window['tharai_meaning']}\n"
+        f"Nakshatra interval: {window['nakshatra_start']} – {window['nakshatra_end']}\n"
+        f"Period interval: {window['period_start']} – {window['period_end']}"
+    )
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@nakshatra-panchang",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{ics_datetime(window['start'], tz)}",
+        f"DTEND:{ics_datetime(window['end'], tz)}",
+        f"SUMMARY:{ics_escape(summary)}",
+        f"DESCRIPTION:{ics_escape(description)}",
+        "END:VEVENT"
+    ]
+    return "".join(ics_fold(line) for line in lines)
+
+def export_windows(windows, fmt, out, nakshatra="", tz=DEFAULT_TIMEZONE):
+    """
+    Write windows to the open text stream out as 'csv', 'ndjson' or 'ics',
+    one record at a time. Returns the number of records written.
+    CSV and NDJSON keep the page's local times; iCalendar times are converted
+    from tz to UTC so calendars in any zone show them at the right moment.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for window in windows:
+            writer.writerow(window)
+            count += 1
+    elif fmt == "ndjson":
+        for window in windows:
+            out.write(json.dumps(window, ensure_ascii=False) + "\n")
+            count += 1
+    elif fmt == "ics":
+        dtstamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        out.write(ics_fold("BEGIN:VCALENDAR"))
+        out.write(ics_fold("VERSION:2.0"))
+        out.write(ics_fold("PRODID:-//nakshatra_panchang//Auspicious Times//EN"))
+        out.write(ics_fold(f"X-WR-CALNAME:{ics_escape(nakshatra + ' auspicious times')}"))
+        for window in windows:
+            out.write(ics_event(window, nakshatra, dtstamp, tz))
+            count += 1
+        out.write(ics_fold("END:VCALENDAR"))
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return count
+
+def report_missing_days(missing):
+    """Print the dates that could not be fetched to stderr; returns the exit status."""
+    if not missing:
+        return 0
+    shown = ", ".join(missing[:10]) + (", ..." if len(missing) > 10 else "")
+    print(f"{len(missing)} days could not be fetched and are missing: {shown}", file=sys.stderr)
+    return 1
+
+def run_export(argv):
+    """
+    Command-line entry point for: panchang_scraper.py export NAKSHATRA [options].
+    Returns a non-zero exit status when any day is missing from the export.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="panchang_scraper.py export",
+        description="Stream refined auspicious windows for a nakshatra to CSV, NDJSON or iCalendar."
+    )
+    parser.add_argument("nakshatra", help="Birth nakshatra (a key of tharais.json)")
+    parser.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        default=datetime.today().date(), help="First date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--end", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="Last date inclusive, YYYY-MM-DD (overrides --days)")
+    parser.add_argument("--days", type=int, default=5, help="Number of days when --end is not given")
+    parser.add_argument("--format", choices=["csv", "ndjson", "ics"], default="csv")
+    parser.add_argument("--output", "-o", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--tharais", default=THARAIS_PATH, help="Path to the Tharai charts JSON")
+    parser.add_argument("--archive", help="Also append every fetched page to this archive")
+    parser.add_argument("--tz", default=DEFAULT_TIMEZONE,
+                        help=f"IANA timezone of the panchang location, for iCalendar output (default: {DEFAULT_TIMEZONE})")
+    args = parser.parse_args(argv)
+
+    chart_name, chart = find_tharai_chart(load_tharai_charts(args.tharais), args.nakshatra)
+    if chart is None:
+        parser.error(f"Unknown nakshatra: {args.nakshatra}")
+    try:
+        ZoneInfo(args.tz)
+    except (ValueError, KeyError):
+        parser.error(f"Unknown timezone: {args.tz}")
+    end_date = args.end if args.end else args.start + timedelta(days=args.days - 1)
+
+    stats = {}
+    archive = PanchangArchive(args.archive) if args.archive else None
+    started = time.perf_counter()
+    windows = iter_auspicious_windows(chart, args.start, end_date, stats, archive)
+    try:
+        newline = "" if args.format in ("csv", "ics") else None
+        if args.output == "-":
+            # CSV and iCalendar write their own \r\n; keep text mode from
+            # turning it into \r\r\n on Windows.
+            sys.stdout.reconfigure(newline=newline)
+            count = export_windows(windows, args.format, sys.stdout, chart_name, args.tz)
+        else:
+            with open(args.output, "w", encoding="utf-8", newline=newline) as out:
+                count = export_windows(windows, args.format, out, chart_name, args.tz)
+    finally:
+        if archive is not None:
+            archive.close()
+    elapsed = time.perf_counter() - started
+    rate = stats["days"] / elapsed if elapsed > 0 else 0.0
+    print(f"Exported {count} windows over {stats['days']} days in {elapsed:.1f}s "
+          f"({rate:.2f} days/s)", file=sys.stderr)
+    return report_missing_days(stats["missing"])
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        sys.exit(run_export(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "reparse":
+        run_reparse(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        run_replay(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] in ("queue-add", "worker", "queue-status", "queue-export"):
+        run_queue_command(sys.argv[1], sys.argv[2:])
+        sys.exit(0)
+
+    args = sys.argv[1:]
+    archive = None
+    if "--archive" in args:
+        pos = args.index("--archive")
+        if pos + 1 >= len(args):
+            print("usage: panchang_scraper.py [num_days] [--archive PATH]\n"
+                  "panchang_scraper.py: error: argument --archive: expected one argument", file=sys.stderr)
+            sys.exit(2)
+        archive = PanchangArchive(args[pos + 1])
+        del args[pos:pos + 2]
+
     try:
-        num_days = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+        num_days = int(args[0]) if args else 5
     except ValueError:
         num_days = 5
 
-    results = scrape_multiple_days(num_days)
+    results = scrape_multiple_days(num_days, archive)
+    if archive is not None:
+        archive.close()
     print(json.dumps(results, indent=4, ensure_ascii=False))
+    sys.exit(report_missing_days([day for day, data in results.items() if not data]))
@@ -0,0 +1,224 @@
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from panchang_scraper import get_tharai_entry
+
+MINUTE = timedelta(minutes=1)
+
+# ------------------ Timeline ------------------
+
+class Timeline:
+    """
+    A per-minute boolean timeline starting at `start` (minute index 0).
+    Timelines over the same range combine with & (AND), | (OR) and ~ (NOT).
+    """
+
+    def __init__(self, start, mask):
+        self.start = start
+        self.mask = mask
+
+    @classmethod
+    def empty(cls, start, end):
+        """An all-False timeline covering [start, end)."""
+        minutes = int((end - start) / MINUTE)
+        return cls(start, np.zeros(minutes, dtype=bool))
+
+    @property
+    def end(self):
+        return self.start + len(self.mask) * MINUTE
+
+    def add(self, start_dt, end_dt):
+        """Mark [start_dt, end_dt) as True, clipped to the timeline's range."""
+        lo = max(0, int((start_dt - self.start) / MINUTE))
+        hi = min(len(self.mask), int((end_dt - self.start) / MINUTE))
+        if hi > lo:
+            self.mask[lo:hi] = True
+
+    def _check(self, other):
+        if self.start != other.start or len(self.mask) != len(other.mask):
+            raise ValueError("Timelines cover different ranges and cannot be combined")
+
+    def __and__(self, other):
+        self._check(other)
+        return Timeline(self.start, self.mask & other.mask)
+
+    def __or__(self, other):
+        self._check(other)
+        return Timeline(self.start, self.mask | other.mask)
+
+    def __invert__(self):
+        return Timeline(self.start, ~self.mask)
+
+    def windows(self):
+        """Return the True runs as a list of (start_dt, end_dt) tuples."""
+        padded = np.concatenate(([False], self.mask, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        return [
+            (self.start + int(lo) * MINUTE, self.start + int(hi) * MINUTE)
+            for lo, hi in zip(edges[::2], edges[1::2])
+        ]
+
+    def total_minutes(self):
+        return int(self.mask.sum())
+
+# ------------------ Rasterizing Panchang Data ------------------
+
+# Periods prokerala publishes. Their timelines always exist, so a rule naming
+# one stays valid even when no fetched day happens to list it.
+KNOWN_PERIODS = (
+    "Abhijit Muhurtham", "Amrita Kalam", "Brahma Muhurtham",
+    "Rahu Kalam", "Yamagandam", "Gulikai Kalam", "Dur Muhurtham", "Varjyam"
+)
+
+def slugify(name):
+    """'Rahu Kalam' -> 'rahu_kalam'."""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+def build_timelines(normalized_data, tharai_chart, start, end):
+    """
+    Rasterize normalized Panchang days ({day: normalize_day(...)}) into
+    named Timelines over [start, end):
+
+      tharai              nakshatra intervals whose Tharai is auspicious
+      auspicious_period   periods classified "Auspicious"
+      inauspicious_period periods classified "Inauspicious"
+      gowri_good          Gowri Panchangam rows with status "auspicious"
+      gowri_bad           Gowri Panchangam rows with status "inauspicious"
+      all                 every minute of the range
+      <period_name>       each named period, e.g. rahu_kalam, abhijit_muhurtham
+    """
+    names = ("tharai", "auspicious_period", "inauspicious_period", "gowri_good", "gowri_bad")
+    timelines = {name: Timeline.empty(start, end) for name in names}
+    timelines.update((slugify(name), Timeline.empty(start, end)) for name in KNOWN_PERIODS)
+    timelines["all"] = ~Timeline.empty(start, end)
+
+    for normalized in normalized_data.values():
+        for nk in normalized["nakshatras"]:
+            entry = get_tharai_entry(nk.name, tharai_chart)
+            if nk.start_dt and entry and entry["auspicious"]:
+                timelines["tharai"].add(nk.start_dt, nk.end_dt)
+        for pp in normalized["periods"]:
+            if not pp.start_dt:
+                continue
+            slug = slugify(pp.name)
+            if slug not in timelines:
+                timelines[slug] = Timeline.empty(start, end)
+            timelines[slug].add(pp.start_dt, pp.end_dt)
+            if pp.period_type == "Auspicious":
+                timelines["auspicious_period"].add(pp.start_dt, pp.end_dt)
+            elif pp.period_type == "Inauspicious":
+                timelines["inauspicious_period"].add(pp.start_dt, pp.end_dt)
+        for slot in normalized["gowri"]:
+            if not slot.start_dt:
+                continue
+            if slot.status == "auspicious":
+                timelines["gowri_good"].add(slot.start_dt, slot.end_dt)
+            elif slot.status == "inauspicious":
+                timelines["gowri_bad"].add(slot.start_dt, slot.end_dt)
+    return timelines
+
+def timeline_range(normalized_data):
+    """Midnight of the first fetched day to midnight after the last one."""
+    days = sorted(normalized_data.keys())
+    first = datetime.strptime(days[0], "%Y-%m-%d")
+    last = datetime.strptime(days[-1], "%Y-%m-%d")
+    return first, last + timedelta(days=1)
+
+def coverage_timeline(normalized_data, start, end):
+    """The minutes of the days actually fetched, midnight to midnight."""
+    covered = Timeline.empty(start, end)
+    for day in normalized_data:
+        day_start = datetime.strptime(day, "%Y-%m-%d")
+        covered.add(day_start, day_start + timedelta(days=1))
+    return covered
+
+# ------------------ Rule Expressions ------------------
+
+TOKEN_PATTERN = re.compile(r'\s*(\(|\)|&|\||~|!|[A-Za-z0-9_]+)')
+
+KEYWORD_TOKENS = {"AND": "&", "OR": "|", "NOT": "~", "!": "~"}
+
+def tokenize_rule(rule):
+    """Split a rule into names, parentheses and the operators &, | and ~."""
+    tokens = []
+    pos = 0
+    rule = rule.strip()
+    while pos < len(rule):
+        match = TOKEN_PATTERN.match(rule, pos)
+        if not match:
+            raise ValueError(f"Unexpected character in rule at position {pos}: {rule[pos:]!r}")
+        token = match.group(1)
+        tokens.append(KEYWORD_TOKENS.get(token.upper(), token))
+        pos = match.end()
+    return tokens
+
+def evaluate_rule(rule, timelines):
+    """
+    Evaluate a rule such as "tharai AND gowri_good AND NOT rahu_kalam"
+    (or "tharai & gowri_good & ~rahu_kalam") against named Timelines.
+    NOT binds tighter than AND, which binds tighter than OR.
+    """
+    tokens = tokenize_rule(rule)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        result = parse_and()
+        while peek() == "|":
+            take()
+            result = result | parse_and()
+        return result
+
+    def parse_and():
+        result = parse_not()
+        while peek() == "&":
+            take()
+            result = result & parse_not()
+        return result
+
+    def parse_not():
+        token = peek()
+        if token == "~":
+            take()
+            return ~parse_not()
+        if token == "(":
+            take()
+            result = parse_or()
+            if peek() != ")":
+                raise ValueError("Missing ')' in rule")
+            take()
+            return result
+        if token is None or token in ("&", "|", ")"):
+            raise ValueError(f"Expected a timeline name in rule, got {token!r}")
+        name = take().lower()
+        if name not in timelines:
+            raise ValueError(f"Unknown timeline {name!r}; available: {', '.join(sorted(timelines))}")
+        return timelines[name]
+
+    if not tokens:
+        raise ValueError("Empty rule")
+    result = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected {tokens[pos]!r} in rule")
+    return result
+
+def find_rule_windows(normalized_data, tharai_chart, rule):
+    """
+    Rasterize normalized_data and return the (start_dt, end_dt) windows matching rule.
+    normalized_data holds only the days that were fetched; the result is limited
+    to those days, so NOT cannot turn a day without data into a full-day window.
+    """
+    if not normalized_data:
+        return []
+    start, end = timeline_range(normalized_data)
+    timelines = build_timelines(normalized_data, tharai_chart, start, end)
+    return (evaluate_rule(rule, timelines) & coverage_timeline(normalized_data, start, end)).windows()
@@ -1,11 +1,24 @@
-import re
 import json
-import requests
-from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+import os
+from datetime import datetime
 import streamlit as st
 import pandas as pd
 from collections import defaultdict
+from panchang_analysis import (
+    FETCH_BUDGET_SECONDS, fetch_days, format_dt, get_auspicious_dates_and_times,
+    get_missing_days, get_nakshatra_auspicious_info_actual_date, get_time_periods,
+    refine_auspicious_times
+)
+from panchang_archive import PanchangArchive
+from panchang_timeline import find_rule_windows
+
+# Every fetched page is appended here; set PANCHANG_ARCHIVE="" to disable.
+ARCHIVE_PATH = os.environ.get("PANCHANG_ARCHIVE", "panchang_pages.bin")
+
+@st.cache_resource
+def get_page_archive(path=ARCHIVE_PATH):
+    """One archive shared by all sessions of this server process."""
+    return PanchangArchive(path) if path else None
 
 # ---------------- Load Tharai Charts from JSON File ----------------
 @st.cache_data
@@ -43,431 +56,29 @@ def format_iso_date(iso_date: str) -> str:
     weekday_str = dobj.strftime("%A")
     return f"{day_str} {month_str} {year_str} - {weekday_str}"
 
-def safe_text(element):
-    """Return the stripped text of an element, or '' if element is None."""
-    return element.get_text(strip=True) if element else ''
-
-def format_dt(dt):
-    """Format a datetime object as 'Apr 24 04:18 AM'."""
-    return dt.strftime("%b %d %I:%M %p")
-
-def get_tharai_info(star_name, tharai_chart):
-    """
-    Given a star_name (e.g. 'Uthiradam') and a Tharai chart,
-    return (tharai_name, tharai_meaning) if found, else (None, None).
-    """
-    star_lower = star_name.lower()
-    for entry in tharai_chart:
-        for chart_star in entry["nakshatra_names"]:
-            if chart_star.lower() == star_lower:
-                return entry["tharai"], entry.get("meaning", "")
-    return None, None
-
-# ------------------ Parsing Functions ------------------
-
-def parse_datetime_str(date_str, fallback_year):
-    """
-    Attempts to parse a string like 'Mar 23 03:23 AM' by inserting fallback_year if missing.
-    Returns a datetime object.
-    """
-    pattern_year = r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}\s+\d{4}'
-    if not re.search(pattern_year, date_str):
-        parts = date_str.split()
-        if len(parts) >= 2:
-            date_str = f"{parts[0]} {parts[1]} {fallback_year} {' '.join(parts[2:])}"
-    fmt = "%b %d %Y %I:%M %p"
-    return datetime.strptime(date_str, fmt)
-
-def parse_nakshatra_interval(text_line, fallback_year):
-    """
-    Example: "Uthiradam - Mar 26 03:49 AM – Mar 27 02:29 AM"
-    Returns (nakshatra_name, start_dt, end_dt) or None if invalid.
+def fetch_multiple_days(num_days=5, start_date=None, budget=FETCH_BUDGET_SECONDS):
     """
-    if " - " not in text_line or "–" not in text_line:
-        return None
-    nak_part, times_part = text_line.split(" - ", 1)
-    if "–" not in times_part:
-        return None
-    start_str, end_str = times_part.split("–", 1)
-    start_str = start_str.strip()
-    end_str = end_str.strip()
-    start_dt = parse_datetime_str(start_str, fallback_year)
-    end_dt = parse_datetime_str(end_str, fallback_year)
-    return nak_part.strip(), start_dt, end_dt
-
-def parse_day_period_interval(day_str, item):
+    fetch_days with a progress label. Returns (raw_data, normalized_data).
     """
-    For a day like "2025-03-24" and item {"name": "Abhijit Muhurtham", "time": "11:51 AM – 12:40 PM"}
-    return (period_name, start_dt, end_dt) or None if parse fails.
-    """
-    if "name" not in item or "time" not in item:
-        return None
-    period_name = item["name"]
-    time_str = item["time"]
-    if "–" not in time_str:
-        return None
-    start_str, end_str = time_str.split("–", 1)
-    start_str = start_str.strip()
-    end_str = end_str.strip()
-    day_date = datetime.strptime(day_str, "%Y-%m-%d").date()
-    fmt_time = "%I:%M %p"
-    try:
-        start_t = datetime.strptime(start_str, fmt_time).time()
-        end_t = datetime.strptime(end_str, fmt_time).time()
-    except ValueError:
-        return None
-    start_dt = datetime.combine(day_date, start_t)
-    end_dt = datetime.combine(day_date, end_t)
-    return period_name, start_dt, end_dt
-
-def intersect_intervals(a_start, b_start, a_end, b_end):
-    """
-    Return (start, end) of the intersection or None if no overlap.
-    Adjusted parameter order to avoid confusion.
-    """
-    start = max(a_start, b_start)
-    end = min(a_end, b_end)
-    if end > start:
-        return (start, end)
-    return None
-
-# ------------------ Panchang Data Fetching Functions ------------------
-
-def parse_primary_header(soup):
-    header_data = {}
-    header = soup.find('div', class_='panchang-box-primary-header')
-    if header:
-        date_elem = header.find('a', class_='t-lg b d-block')
-        loc_elem = header.find('a', attrs={'data-focus': 'location'})
-        header_data['date'] = safe_text(date_elem)
-        header_data['location'] = safe_text(loc_elem)
-    return header_data
-
-def parse_secondary_header(soup):
-    secondary = {}
-    header = soup.find('div', class_='panchang-box-secondary-header')
-    if header:
-        items = header.find_all('div', class_='list-item-outer')
-        for item in items:
-            label_elem = item.find('span', class_='d-block t-sm')
-            value_elem = item.find('span', class_='d-block b')
-            label = safe_text(label_elem)
-            value = safe_text(value_elem)
-            if label:
-                secondary[label] = value
-    return secondary
-
-def parse_data_blocks(soup):
-    details = {}
-    details_section = soup.find('div', class_='panchang-box-details')
-    if details_section:
-        blocks = details_section.find_all('div', class_='panchang-box-data-block')
-        for block in blocks:
-            title_elem = block.find('span', class_='d-block b')
-            if title_elem:
-                title = safe_text(title_elem)
-                block_classes = block.get("class", [])
-                is_inauspicious = any("inauspicious" in cls for cls in block_classes)
-                is_auspicious = any("auspicious" in cls for cls in block_classes) and not is_inauspicious
-                items = []
-                for li in block.find_all('li'):
-                    text = " ".join(li.stripped_strings)
-                    if ' - ' in text:
-                        key, value = text.split(' - ', 1)
-                        item = {"name": key.strip(), "time": value.strip()}
-                    else:
-                        item = {"text": text}
-                    if "Period" in title:
-                        if is_inauspicious:
-                            item["auspicious"] = False
-                        elif is_auspicious:
-                            item["auspicious"] = True
-                        else:
-                            item["auspicious"] = None
-                    items.append(item)
-                details[title] = items
-    return details
-
-def parse_gowri_panchang(soup):
-    gowri = {}
-    gowri_div = soup.find('div', id='gowri-panchang')
-    if gowri_div:
-        tab_panes = gowri_div.find_all('div', class_='tab-pane')
-        for pane in tab_panes:
-            tab_id = pane.get('id')
-            if tab_id:
-                entries = []
-                rows = pane.find_all('tr')
-                for row in rows:
-                    th = row.find('th')
-                    td = row.find('td')
-                    if th and td:
-                        period = safe_text(th)
-                        time_val = safe_text(td)
-                        row_classes = row.get("class", [])
-                        if any("inauspicious" in cls for cls in row_classes):
-                            status = "inauspicious"
-                        elif any("auspicious" in cls for cls in row_classes):
-                            status = "auspicious"
-                        else:
-                            status = None
-                        entries.append({
-                            'period': period,
-                            'time': time_val,
-                            'status': status
-                        })
-                gowri[tab_id] = entries
-    return gowri
-
-def parse_additional_tabs(soup):
-    tabs_data = {}
-    tabs_container = soup.find('div', class_='tab-content p-2 no-margin')
-    if tabs_container:
-        tab_panes = tabs_container.find_all('div', class_='tab-pane')
-        for pane in tab_panes:
-            tab_id = pane.get('id')
-            if tab_id:
-                paragraphs = [safe_text(p) for p in pane.find_all('p') if safe_text(p)]
-                tabs_data[tab_id] = paragraphs
-    return tabs_data
-
-def fetch_panchang_data(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    data = {
-        'primary_header': parse_primary_header(soup),
-        'secondary_header': parse_secondary_header(soup),
-        'details': parse_data_blocks(soup),
-        'gowri_panchang': parse_gowri_panchang(soup),
-        'additional_tabs': parse_additional_tabs(soup)
-    }
-    return data
-
-def fetch_data_from_url(url):
-    """Fetch data from a server (URL not shown to user)."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except Exception as e:
-        st.error(f"Error fetching data from server: {e}")
-        return {}
-    return fetch_panchang_data(response.text)
-
-def generate_url_for_date(date_obj):
-    """Not disclosing the actual source to the user."""
-    date_str = date_obj.strftime("%Y-%B-%d").lower()
-    return f"https://www.prokerala.com/astrology/tamil-panchangam/{date_str}.html"
-
-def fetch_multiple_days(num_days=5, start_date=None):
-    if start_date is None:
-        start_date = datetime.today().date()
-
-    all_data = {}
-    
     # Create a single placeholder for dynamic status updates
     status_label = st.empty()
     status_label.info("Starting Panchang data fetch...")
 
-    for i in range(num_days):
-        current_date = start_date + timedelta(days=i)
-        url = generate_url_for_date(current_date)
-        # Update the same label each iteration instead of creating a new message
-        status_label.info(f"Fetching Panchang data for {current_date.isoformat()} ...")
-        
-        data = fetch_data_from_url(url)
-        all_data[current_date.isoformat()] = data
-
-    # Once the loop finishes, show a success message in the same label
-    status_label.success("Successfully fetched Panchang data for all dates.")
-    
-    return all_data
-
+    # Update the same label each day instead of creating a new message
+    def show_progress(day):
+        status_label.info(f"Fetching Panchang data for {day} ...")
 
-# ------------------- Additional Analysis Functions -------------------
+    all_data, normalized_data = fetch_days(num_days, start_date, budget, get_page_archive(), show_progress)
 
-def get_time_periods(fetched_data):
-    """
-    Extract time period details from Panchang data for blocks with "Period" in the title.
-    """
-    periods = []
-    for day, data in fetched_data.items():
-        details = data.get("details", {})
-        for title, items in details.items():
-            if "period" in title.lower():
-                period_type = "Unknown"
-                if "auspicious period" in title.lower() and "inauspicious" not in title.lower():
-                    period_type = "Auspicious"
-                elif "inauspicious period" in title.lower():
-                    period_type = "Inauspicious"
-                for item in items:
-                    if "name" in item and "time" in item:
-                        periods.append({
-                            "date": day,
-                            "period_type": period_type,
-                            "period": item["name"],
-                            "time": item["time"]
-                        })
-    return periods
-
-def get_auspicious_dates_and_times(fetched_data, tharai_chart):
-    """
-    Gather auspicious nakshatras and auspicious periods by day.
-    """
-    # We'll use the lumps-based approach to get all intervals quickly
-    # (not reassigning to actual start date).
-    info_list = []
-    for day, data in fetched_data.items():
-        details = data.get("details", {})
-        for title, items in details.items():
-            if "nakshatram" in title.lower():
-                for item in items:
-                    if "name" in item and "time" in item:
-                        nak_name = item["name"].strip().lower()
-                        for entry in tharai_chart:
-                            for chart_nak in entry["nakshatra_names"]:
-                                if nak_name == chart_nak.lower():
-                                    info_list.append({
-                                        "date": day,
-                                        "nakshatra": item["name"],
-                                        "time": item["time"],
-                                        "auspicious": entry["auspicious"]
-                                    })
-                                    break
-
-    # For each day, if an interval is auspicious, we store it
-    ausp_nak_by_day = defaultdict(list)
-    for rec in info_list:
-        if rec["auspicious"]:
-            ausp_nak_by_day[rec["date"]].append(f"{rec['nakshatra']} ({rec['time']})")
-
-    # For time periods
-    periods_all = get_time_periods(fetched_data)
-    ausp_times_by_day = defaultdict(list)
-    for rec in periods_all:
-        if rec["period_type"].lower() == "auspicious":
-            ausp_times_by_day[rec["date"]].append(f"{rec['period']}: {rec['time']}")
-
-    # Build final list
-    result = []
-    all_dates = set(list(ausp_nak_by_day.keys()) + list(ausp_times_by_day.keys()))
-    for d in sorted(all_dates):
-        result.append({
-            "date": d,
-            "auspicious_nakshatras": ", ".join(ausp_nak_by_day[d]),
-            "auspicious_periods": ", ".join(ausp_times_by_day[d])
-        })
-    return result
-
-def get_nakshatra_auspicious_info_actual_date(fetched_data, tharai_chart):
-    """
-    Reassign each nakshatra interval to its actual start date, ignoring lumps.
-    """
-    results = []
-    for day, day_data in fetched_data.items():
-        fallback_year = day.split("-")[0]
-        details = day_data.get("details", {})
-        for title, items in details.items():
-            if "nakshatram" in title.lower():
-                for li in items:
-                    if "name" in li and "time" in li:
-                        star_name = li["name"].strip()
-                        text_line = f"{star_name} - {li['time']}"
-                        parsed = parse_nakshatra_interval(text_line, fallback_year)
-                        if parsed:
-                            nak_name, start_dt, end_dt = parsed
-                            actual_day_iso = start_dt.date().isoformat()
-                            star_lower = nak_name.lower()
-                            star_tharai = None
-                            star_ausp = False
-                            for entry in tharai_chart:
-                                if any(star_lower == s.lower() for s in entry["nakshatra_names"]):
-                                    star_tharai = entry["tharai"]
-                                    star_ausp = entry["auspicious"]
-                                    break
-                            results.append({
-                                "date": actual_day_iso,
-                                "nakshatra": nak_name,
-                                "time": li["time"],
-                                "tharai": star_tharai if star_tharai else "Unknown Tharai",
-                                "auspicious": star_ausp
-                            })
-    return results
-
-def refine_auspicious_times(fetched_data, tharai_chart):
-    """
-    Build intervals for auspicious nakshatras (original data grouping).
-    Build intervals for Panchang-labeled "Auspicious Period".
-    Intersect them. Return a list of records.
-    """
-    from collections import defaultdict
-    nakshatra_intervals = []
-    for day, day_data in fetched_data.items():
-        fallback_year = day.split("-")[0]
-        details = day_data.get("details", {})
-        for title, items in details.items():
-            if "nakshatram" in title.lower():
-                for li in items:
-                    if "name" in li and "time" in li:
-                        parsed = parse_nakshatra_interval(f"{li['name']} - {li['time']}", fallback_year)
-                        if parsed:
-                            nak_name, start_dt, end_dt = parsed
-                            tharai_name, tharai_meaning = get_tharai_info(nak_name, tharai_chart)
-                            if tharai_name:
-                                is_ausp = False
-                                for entry in tharai_chart:
-                                    if entry["tharai"] == tharai_name:
-                                        is_ausp = entry["auspicious"]
-                                        break
-                                if is_ausp:
-                                    nakshatra_intervals.append({
-                                        "day": day,
-                                        "nakshatra_name": nak_name,
-                                        "start_dt": start_dt,
-                                        "end_dt": end_dt,
-                                        "tharai_name": tharai_name,
-                                        "tharai_meaning": tharai_meaning
-                                    })
-    panchang_periods = []
-    for day, day_data in fetched_data.items():
-        fallback_year = day.split("-")[0]
-        details = day_data.get("details", {})
-        for title, items in details.items():
-            if "auspicious period" in title.lower() and "inauspicious" not in title.lower():
-                for li in items:
-                    parsed_item = parse_day_period_interval(day, li)
-                    if parsed_item:
-                        period_name, start_dt, end_dt = parsed_item
-                        panchang_periods.append({
-                            "day": day,
-                            "period_name": period_name,
-                            "start_dt": start_dt,
-                            "end_dt": end_dt
-                        })
-
-    results = []
-    nk_by_day = defaultdict(list)
-    pp_by_day = defaultdict(list)
-    for nk in nakshatra_intervals:
-        nk_by_day[nk["day"]].append(nk)
-    for pp in panchang_periods:
-        pp_by_day[pp["day"]].append(pp)
-    all_days = set(nk_by_day.keys()) | set(pp_by_day.keys())
-    for d in sorted(all_days):
-        for nk in nk_by_day[d]:
-            for pp in pp_by_day[d]:
-                overlap = intersect_intervals(nk["start_dt"], pp["start_dt"], nk["end_dt"], pp["end_dt"])
-                if overlap:
-                    s, e = overlap
-                    results.append({
-                        "date": d,
-                        "nakshatra": nk["nakshatra_name"],
-                        "tharai_name": nk["tharai_name"],
-                        "tharai_meaning": nk["tharai_meaning"],
-                        "nakshatra_interval": f"{format_dt(nk['start_dt'])} – {format_dt(nk['end_dt'])}",
-                        "panchang_period": pp["period_name"],
-                        "period_interval": f"{format_dt(pp['start_dt'])} – {format_dt(pp['end_dt'])}",
-                        "start_dt": s
-                    })
-    return results
+    missing = get_missing_days(all_data)
+    if missing:
+        status_label.warning(f"Fetched {num_days - len(missing)} of {num_days} days; "
+                             f"results below are partial.")
+    else:
+        # Once the loop finishes, show a success message in the same label
+        status_label.success("Successfully fetched Panchang data for all dates.")
+    
+    return all_data, normalized_data
 
 # ------------------- Streamlit Dashboard -------------------
 
@@ -517,11 +128,17 @@ selected_chart = THARAI_CHARTS[selected_nakshatra]
 
 selected_date = st.date_input("Select start date", value=datetime.today().date())
 num_days = st.number_input("Enter number of days", min_value=1, max_value=10, value=5, step=1)
+custom_rule = st.text_input(
+    "Custom rule (optional)",
+    value="tharai AND (auspicious_period OR gowri_good) AND NOT inauspicious_period",
+    help="Combine tharai, auspicious_period, inauspicious_period, gowri_good, gowri_bad "
+         "or any period name (e.g. rahu_kalam, yamagandam) with AND, OR, NOT and parentheses."
+)
 
 # 2) The user clicks "Get auspicious times" to fetch data
 if st.button("Get auspicious times"):
     with st.spinner("Fetching Panchang data..."):
-        fetched_results = fetch_multiple_days(num_days=num_days, start_date=selected_date)
+        fetched_results, normalized_results = fetch_multiple_days(num_days=num_days, start_date=selected_date)
     st.success("Calculating auspicious times ...")
     
     # Create tabs
@@ -534,9 +151,17 @@ if st.button("Get auspicious times"):
     with tabs[0]:
         st.header(f"{selected_nakshatra} - Auspicious Times Analysis")
 
+        missing_days = get_missing_days(fetched_results)
+        if missing_days:
+            st.warning(
+                "Panchang data is missing for: "
+                + ", ".join(f"{format_iso_date(d)} ({reason})" for d, reason in sorted(missing_days.items()))
+                + ". The analysis below covers the remaining days only."
+            )
+
         # A) True Auspicious Intervals (Intersection) - original grouping
         st.subheader("True Auspicious Times based on Nakshatra and Panchang Periods")
-        refined = refine_auspicious_times(fetched_results, selected_chart)
+        refined = refine_auspicious_times(normalized_results, selected_chart)
         if refined:
             refined_by_date_nak = defaultdict(lambda: defaultdict(list))
             for rec in refined:
@@ -559,7 +184,7 @@ if st.button("Get auspicious times"):
 
         # B) Basic Nakshatra Analysis - reassign each nakshatra to actual start date
         st.subheader("Basic Nakshatra Analysis (Actual Start Date)")
-        nak_info_actual = get_nakshatra_auspicious_info_actual_date(fetched_results, selected_chart)
+        nak_info_actual = get_nakshatra_auspicious_info_actual_date(normalized_results, selected_chart)
         # Group by actual date
         date_analysis = defaultdict(lambda: {"intervals": [], "isAusp": False})
         for rec in nak_info_actual:
@@ -597,7 +222,7 @@ if st.button("Get auspicious times"):
 
         # D) Time Periods
         st.subheader("Basic Time Periods")
-        time_periods = get_time_periods(fetched_results)
+        time_periods = get_time_periods(normalized_results)
         if time_periods:
             time_grouped = defaultdict(list)
             for rec in time_periods:
@@ -613,7 +238,7 @@ if st.button("Get auspicious times"):
 
         # E) Basic Auspicious Dates and Times Summary
         st.subheader("Auspicious Dates and Corresponding Auspicious Times (Basic)")
-        auspicious_summary = get_auspicious_dates_and_times(fetched_results, selected_chart)
+        auspicious_summary = get_auspicious_dates_and_times(normalized_results, selected_chart)
         if auspicious_summary:
             for rec in auspicious_summary:
                 date_label = format_iso_date(rec["date"])
@@ -623,12 +248,34 @@ if st.button("Get auspicious times"):
         else:
             st.info("No auspicious summary found.")
 
+        # F) Custom Rule Windows
+        if custom_rule.strip():
+            st.subheader("Custom Rule Windows")
+            st.caption(f"Rule: {custom_rule}")
+            try:
+                rule_windows = find_rule_windows(normalized_results, selected_chart, custom_rule)
+            except ValueError as e:
+                st.error(f"Invalid rule: {e}")
+                rule_windows = []
+            if rule_windows:
+                windows_by_date = defaultdict(list)
+                for start_dt, end_dt in rule_windows:
+                    windows_by_date[start_dt.date().isoformat()].append((start_dt, end_dt))
+                for date in sorted(windows_by_date.keys()):
+                    with st.expander(f"Date: {format_iso_date(date)}", expanded=True):
+                        for start_dt, end_dt in windows_by_date[date]:
+                            st.markdown(f"- {format_dt(start_dt)} – {format_dt(end_dt)}")
+            else:
+                st.info("No windows match the rule.")
+
     # === Daily Panchang Tabs (original grouping) ===
     for i, day in enumerate(day_titles):
         date_label = format_iso_date(day)
         with tabs[i+1]:
             st.subheader(f"Panchang for {date_label}")
             data_for_day = fetched_results[day]
+            if "missing" in data_for_day:
+                st.warning(f"Panchang data for this day is missing: {data_for_day['missing']}.")
 
             primary = data_for_day.get("primary_header", {})
             if primary: